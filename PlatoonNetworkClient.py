@@ -1,87 +1,222 @@
-# PlatoonNetworkClient.py
-# Client interface connector program for the platoon network.
-# Allows a client on the platoon network to communicate with other clients
-#       through message broadcasting. 
-# Author: Franz Alarcon
-
-import socket
-import threading
-
-# PlatoonNetworkClient
-# Client connector for platooning network
-# Use to send and receive string messages between platoon clients
-class PlatoonNetworkClient:
-    _host = socket.gethostname()
-    _port = 52384
-
-    # Constructor
-    def __init__(self):
-        self.soc = None
-        self.message_handler = None
-        self.disconnect_handler = None
-
-    # Connect to the platooning network server
-    # Requires that message_handler be set before
-    def connect(self):
-        if self.message_handler == None:
-            print('ERROR: PlatoonNetwork message handler not set.')
-            return
-        
-        self.soc = socket.socket()
-        self.soc.connect((self._host, self._port))
-        threading.Thread(target=self._recv_handler).start()
-    
-    # Disconnect from the platooning network server
-    # Does nothing if not already connected
-    def disconnect(self):
-        if self.soc == None:
-            return
-        
-        self.soc.close()
-        self.soc = None
-
-    # Send a message to all clients on the platooning network server
-    # Requires that a connection have been made with the server
-    def send(self, message):
-        if self.soc == None:
-            print("ERROR: Trying to send message without connection.")
-            return
-        
-        self.soc.send(message.encode('ascii'))
-
-    # Set the message_handler
-    # This handler is called whenever the connected client receives a message
-    #   from the server
-    # Handler function must accept a string parameter which contains the 
-    #   content of the message
-    def set_message_handler(self, handler):
-        self.message_handler = handler
-
-    # Set the disconnect_handler
-    # This handler is called if the client disconnects from the server without
-    #   explicitly calling disconnect()
-    def set_disconnect_handler(self, handler):
-        self.disconnect_handler = handler
-
-    # Private receive socket message handler
-    def _recv_handler(self):
-        while True:
-            try:
-                msg = self.soc.recv(1024)
-                if self.message_handler != None:
-                    self.message_handler(msg.decode('ascii'))
-            except Exception as e:
-
-                if hasattr(e, 'message'):
-                    print(e.message)
-                else:
-                    print(e)
-
-                if self.soc != None:
-                    print("ERROR: Connection lost to server.")
-                    self.soc.close()
-                    self.soc = None
-                    if self.disconnect_handler != None:
-                        print("Executing disconnect handler.")
-                        self.disconnect_handler()
-                break
+# PlatoonNetworkClient.py
+# Client interface connector program for the platoon network.
+# Allows a client on the platoon network to communicate with other clients
+#       through message broadcasting.
+# Author: Franz Alarcon
+
+import select
+import socket
+import struct
+import selectors
+import threading
+
+# MSG_MORE hints to the kernel that more data follows so correlated frames
+#   coalesce into one segment; not available on all platforms
+_MSG_MORE = getattr(socket, 'MSG_MORE', 0)
+
+# Shared receive selector
+# Every connected client registers its socket here; one background thread
+#   waits for readiness and dispatches to the owning client, instead of each
+#   client paying for its own thread blocked in recv()
+_selector = selectors.DefaultSelector()
+_selector_thread = None
+
+# Wake-up socket pair for the receive thread
+# A socket registered while the thread is blocked in select() would not be
+#   waited on until the next wakeup; writing a byte here wakes the thread
+#   immediately, which lets select() block with no timeout instead of
+#   spinning awake on an interval to notice new registrations
+_waker_recv, _waker_send = socket.socketpair()
+_waker_recv.setblocking(False)
+_selector.register(_waker_recv, selectors.EVENT_READ, None)
+
+# Wait for registered sockets to become readable and dispatch each one to its
+#   owning client
+# The waker registration carries no client and is just drained
+def _selector_loop():
+    while True:
+        for key, mask in _selector.select():
+            if key.data == None:
+                try:
+                    while _waker_recv.recv(4096):
+                        pass
+                except BlockingIOError:
+                    pass
+                continue
+            key.data._on_readable()
+
+# Start the shared receive thread if not already running
+def _start_selector_thread():
+    global _selector_thread
+    if _selector_thread == None:
+        _selector_thread = threading.Thread(target=_selector_loop, daemon=True)
+        _selector_thread.start()
+
+# PlatoonNetworkClient
+# Client connector for platooning network
+# Use to send and receive messages between platoon clients
+# Messages are passed to and from callers as bytes; strings passed to send
+#   are encoded for convenience
+# Messages are framed on the wire with a 4-byte big-endian length prefix so
+#   that receivers always get back complete messages (TCP is a byte stream
+#   and does not preserve send boundaries)
+class PlatoonNetworkClient:
+    _host = socket.gethostname()
+    _port = 52384
+
+    # Constructor
+    def __init__(self):
+        self.soc = None
+        self.message_handler = None
+        self.disconnect_handler = None
+        self.receive_chunk = 4096
+        self._recv_buf = bytearray()
+        self._chunk_buf = None
+        self._chunk_view = None
+
+    # Connect to the platooning network server
+    # Requires that message_handler be set before
+    def connect(self):
+        if self.message_handler == None:
+            print('ERROR: PlatoonNetwork message handler not set.')
+            return
+
+        self.soc = socket.socket()
+        self.soc.connect((self._host, self._port))
+
+        # Disable Nagle's algorithm so the small control frames go out
+        #   immediately instead of being coalesced for up to ~40 ms, which
+        #   would lag the platoon's reaction time
+        self.soc.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.soc.setblocking(False)
+        self._recv_buf.clear()
+
+        # Fixed receive buffer reused for every recv_into call, so reads do
+        #   not allocate a fresh bytes object per chunk
+        self._chunk_buf = bytearray(self.receive_chunk)
+        self._chunk_view = memoryview(self._chunk_buf)
+
+        _selector.register(self.soc, selectors.EVENT_READ, self)
+        _start_selector_thread()
+        _waker_send.send(b'\x00')
+
+    # Disconnect from the platooning network server
+    # Does nothing if not already connected
+    def disconnect(self):
+        if self.soc == None:
+            return
+
+        _selector.unregister(self.soc)
+        self.soc.close()
+        self.soc = None
+
+    # Send a message to all clients on the platooning network server
+    # Accepts either a string or pre-encoded bytes, so callers that cache
+    #   encoded messages do not pay for a re-encode on every send
+    # Pass more=True when another message follows immediately so the kernel
+    #   can pack the frames into a single TCP segment (the final send of a
+    #   batch should use the default)
+    # Requires that a connection have been made with the server
+    def send(self, message, more=False):
+        if self.soc == None:
+            print("ERROR: Trying to send message without connection.")
+            return
+
+        if isinstance(message, str):
+            message = message.encode('ascii')
+        self._send_raw(struct.pack('>I', len(message)) + message,
+                       _MSG_MORE if more else 0)
+
+    # Write the full buffer to the socket
+    # The socket is non-blocking for the shared receive selector, so a send
+    #   can complete partially or not at all when the kernel buffer is full;
+    #   loop until every byte is handed off rather than dropping the tail
+    #   (a short write would desynchronize the receiver's framing)
+    def _send_raw(self, data, flags=0):
+        view = memoryview(data)
+        while len(view) > 0:
+            try:
+                sent = self.soc.send(view, flags)
+            except BlockingIOError:
+                select.select([], [self.soc], [])
+                continue
+            view = view[sent:]
+
+    # Set the message_handler
+    # This handler is called whenever the connected client receives a message
+    #   from the server
+    # Handler function must accept a bytes parameter which contains the
+    #   content of the message
+    def set_message_handler(self, handler):
+        self.message_handler = handler
+
+    # Set the disconnect_handler
+    # This handler is called if the client disconnects from the server without
+    #   explicitly calling disconnect()
+    def set_disconnect_handler(self, handler):
+        self.disconnect_handler = handler
+
+    # Private readiness callback run on the shared receive thread
+    # Drains the socket until it would block, so one wakeup consumes every
+    #   message buffered in the kernel instead of one recv per wakeup, then
+    #   dispatches all complete length-prefixed messages in one batch pass
+    #   over the accumulated buffer
+    def _on_readable(self):
+        error = None
+        while True:
+            try:
+                count = self.soc.recv_into(self._chunk_buf)
+                if count == 0:
+                    raise ConnectionResetError('Server closed connection.')
+            except BlockingIOError:
+                # Kernel buffer drained, wait for the next readiness event
+                break
+            except Exception as e:
+                error = e
+                break
+
+            self._recv_buf += self._chunk_view[:count]
+
+        for msg in self._parse_frames(self._recv_buf):
+            if self.message_handler != None:
+                try:
+                    self.message_handler(msg)
+                except Exception as e:
+                    # The receive thread is shared by every client in the
+                    #   process; a failing handler must run the disconnect
+                    #   path for its own client, not kill the thread
+                    error = e
+                    break
+
+        if error != None:
+            self._handle_recv_error(error)
+
+    # Tear down the connection after a receive error and notify the
+    #   disconnect handler
+    def _handle_recv_error(self, e):
+        if hasattr(e, 'message'):
+            print(e.message)
+        else:
+            print(e)
+
+        if self.soc != None:
+            print("ERROR: Connection lost to server.")
+            self.disconnect()
+            if self.disconnect_handler != None:
+                print("Executing disconnect handler.")
+                self.disconnect_handler()
+
+    # Extract all complete length-prefixed messages from the given buffer
+    # Consumed bytes are removed from the buffer; a partial trailing message
+    #   is left in place until the rest of it arrives
+    @staticmethod
+    def _parse_frames(buf):
+        frames = []
+        while len(buf) >= 4:
+            msg_len = struct.unpack_from('>I', buf)[0]
+            if len(buf) < 4 + msg_len:
+                break
+            frames.append(bytes(buf[4:4 + msg_len]))
+            del buf[:4 + msg_len]
+        return frames
@@ -1,58 +1,115 @@
-# PlatoonNetworkServer.py
-# Server program for the platoon network.
-# Maintains client connections and broadcasts all recieved client messages to
-#   other clients. 
-# Author: Franz Alarcon
-
-import socket
-import threading
-
-host = socket.gethostname()
-port =  52384
-
-# Create server socket and bind
-soc = socket.socket()
-soc.bind((host, port))
-soc.listen()
-
-# Client list
-# Stores the corresponding socket and port number for client i
-client_soc_list = []
-client_port_list = []
-
-# Broadcast a recieved message to other clients (excludes calling client)
-def broadcast_others(msg, sender_port):
-    for i in range(len(client_soc_list)):
-        if sender_port != client_port_list[i]:
-                print('Sending message to {}'.format(client_port_list[i]))
-                client_soc_list[i].send(msg)
-
-# Thread client for recieving messages
-def client_thread(client_conn, address):
-    addr_host, addr_port = address
-    client_soc_list.append(client_conn)
-    client_port_list.append(addr_port)
-
-    print('Added client of port {}'.format(addr_port))
-    
-    while True:
-        try:
-            msg = client_conn.recv(1024)
-            print('Got message from client of port {}'.format(addr_port))
-            broadcast_others(msg, addr_port)
-        except:
-            # Known issue: If a client disconnects, the server will attempt to
-            #   remove the client from its list. However, this causes an error
-            #   saying that the client socket and port could not be found in the
-            #   list. Idk what the solution is I'm prioritizing other issues rn
-            #   since this only occurs when a client disconnects.
-            print("Error! Removing client of port {}".format(addr_port))
-            client_soc_list.remove(client_conn)
-            client_port_list.remove(addr_port)
-            
-print('PlatoonNetworkServer started.')
-
-# Client connection accept loop
-while True:
-    client_conn, addr = soc.accept()
-    threading.Thread(target=client_thread, args=(client_conn, addr)).start()
+# PlatoonNetworkServer.py
+# Server program for the platoon network.
+# Maintains client connections and broadcasts all recieved client messages to
+#   other clients.
+# Author: Franz Alarcon
+
+import socket
+import struct
+import asyncio
+import logging
+import collections
+
+# Per-message diagnostics are logged at DEBUG so they cost one level check
+#   when disabled instead of a stdout write per broadcast
+log = logging.getLogger('platoon')
+
+host = socket.gethostname()
+port =  52384
+
+# Most frames a client may have queued before the oldest are dropped
+# Control frames carry current vehicle state, so fresh frames supersede stale
+#   ones and dropping the oldest on overflow is acceptable
+outbound_queue_limit = 64
+
+# ClientConnection
+# Per-client connection state for the broadcaster.
+# Outbound frames are queued and flushed to the transport in one batch so a
+#   burst of broadcasts costs a single writelines call instead of one write
+#   per frame.
+# The queue is bounded so a slow or stalled client backs up only its own
+#   bounded queue; broadcasts to the other clients are unaffected and server
+#   memory per peer stays fixed.
+class ClientConnection:
+    def __init__(self, writer, port):
+        self.writer = writer
+        self.port = port
+        self.out_queue = collections.deque(maxlen=outbound_queue_limit)
+        self.out_ready = asyncio.Event()
+
+    # Queue a frame for sending to this client
+    def queue_frame(self, frame):
+        self.out_queue.append(frame)
+        self.out_ready.set()
+
+    # Flush queued frames to the client socket until cancelled
+    # All frames queued since the last wakeup are handed to the transport
+    #   together
+    async def drain_queue(self):
+        while True:
+            await self.out_ready.wait()
+            self.out_ready.clear()
+            batch = list(self.out_queue)
+            self.out_queue.clear()
+            self.writer.writelines(batch)
+            await self.writer.drain()
+
+# Client table
+# Maps the StreamWriter for each connected client to its ClientConnection
+# Only touched from the event loop thread, so no locking is needed
+clients = {}
+
+# Broadcast a recieved message to other clients (excludes sending client)
+# The frame bytes are built once by the caller; every client queues the same
+#   memoryview of them, so one incoming message costs one buffer no matter
+#   how many peers it fans out to
+def broadcast_others(msg, sender):
+    frame = memoryview(msg)
+    for conn in clients.values():
+        if conn.writer is sender:
+            continue
+        log.debug('Sending message to %d', conn.port)
+        conn.queue_frame(frame)
+
+# Connection handler for a single client
+# Runs on the server event loop until the client disconnects
+async def handle_client(reader, writer):
+    addr_host, addr_port = writer.get_extra_info('peername')
+
+    # Disable Nagle's algorithm so small JSON control frames are not delayed
+    sock = writer.get_extra_info('socket')
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    conn = ClientConnection(writer, addr_port)
+    clients[writer] = conn
+    drain_task = asyncio.ensure_future(conn.drain_queue())
+    log.info('Added client of port %d', addr_port)
+
+    # Messages arrive with a 4-byte big-endian length prefix; read each frame
+    #   in full so clients are always forwarded complete messages
+    try:
+        while True:
+            header = await reader.readexactly(4)
+            msg_len = struct.unpack('>I', header)[0]
+            payload = await reader.readexactly(msg_len)
+            log.debug('Got message from client of port %d', addr_port)
+            broadcast_others(header + payload, writer)
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        log.info('Removing client of port %d', addr_port)
+        clients.pop(writer, None)
+        drain_task.cancel()
+        writer.close()
+
+# Start the server and accept clients until interrupted
+# All clients are multiplexed on a single thread by the asyncio event loop
+async def main():
+    server = await asyncio.start_server(
+        handle_client, host, port, reuse_address=True)
+    print('PlatoonNetworkServer started.')
+    async with server:
+        await server.serve_forever()
+
+logging.basicConfig(level=logging.WARNING)
+asyncio.run(main())
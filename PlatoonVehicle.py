@@ -5,9 +5,26 @@
 # The Carla server and the platoon network server must both be running.
 # Author: Franz Alarcon
 
-import time
+import sys
+import signal
 
-from PlatoonSystemUtility import *
+from PlatoonSystemUtility import (CarlaConnection, VehicleSpawner,
+                                  PlatoonLeadVehicle, PlatoonFollowerVehicle)
+
+# Path selection menu for the lead vehicle
+# Pre-joined so showing the menu is one stdout write instead of ten
+#   separate print calls
+_MENU = '\n'.join((
+    'Select one of the following path patterns:',
+    '1. Throttle, cruise, soft brake',
+    '2. Throttle, soft brake',
+    '3. Throttle, cruise, soft brake',
+    '4. Throttle, soft brake',
+    '5. Throttle, cruise (no broadcast), brake',
+    '6. Throttle, cruise, brake (no broadcast)',
+    '7. Throttle, brake (no broadcast)',
+    '8. Slow acceleration',
+    '9. Repeated braking')) + '\n'
 
 # Connect to Carla server
 CarlaConnection.connect()
@@ -20,44 +37,45 @@ vs.spawn_vehicle()
 vehicle = vs.vehicle
 platoon_rank = vs.vehicle_rank
 
-try:
-    if (platoon_rank == 0):
-        print('You are the lead vehicle.')
+if (platoon_rank == 0):
+    print('You are the lead vehicle.')
 
-        vehicle_behavior = PlatoonLeadVehicle(vehicle)
-        vehicle_behavior.connect()
+    vehicle_behavior = PlatoonLeadVehicle(vehicle)
+    vehicle_behavior.connect()
 
-        print('Select one of the following path patterns:')
-        print('1. Throttle, cruise, soft brake')
-        print('2. Throttle, soft brake')
-        print('3. Throttle, cruise, soft brake')
-        print('4. Throttle, soft brake')
-        print('5. Throttle, cruise (no broadcast), brake')
-        print('6. Throttle, cruise, brake (no broadcast)')
-        print('7. Throttle, brake (no broadcast)')
-        print('8. Slow acceleration')
-        print('9. Repeated braking')
+    sys.stdout.write(_MENU)
 
+    try:
         path_executed = False
         while not path_executed:
             path_num = input('Enter path number: ')
             path_executed = vehicle_behavior.execute_path(int(path_num))
             if not path_executed:
                 print('Unknown path number entered, try again')
+    except KeyboardInterrupt:
+        # Interrupted mid-path; make sure the path runner bails out before
+        #   the vehicle is torn down
+        vehicle_behavior.stop()
+
+    print('Path complete')
+
+else:
+    print("You are vehicle {} in the platoon.".format(platoon_rank + 1))
+
+    vehicle_behavior = PlatoonFollowerVehicle(vehicle, platoon_rank, world)
+    vehicle_behavior.connect()
 
-    else:
-        print("You are vehicle {} in the platoon.".format(platoon_rank + 1))
+    # Stop the behavior loop cleanly on Ctrl-C so the network connection and
+    #   sensors are released before the vehicle is destroyed
+    signal.signal(signal.SIGINT, lambda *_: vehicle_behavior.stop())
 
-        vehicle_behavior = PlatoonFollowerVehicle(vehicle, platoon_rank, world)
-        vehicle_behavior.connect()
+    # Behavior update loop
+    # Sleeps until new sensor or network data arrives, so the vehicle
+    #   reacts as soon as something changes without spinning in between
+    vehicle_behavior.run()
 
-        # Behavior update loop
-        # 1 ms pause after each update to prevent platoon network overload
-        while True:
-            vehicle_behavior.update_behavior()
-            time.sleep(0.0001)
+    print('Platoon vehicle stopped')
 
-finally:
-    #print('destroying vehicle')
-    #vehicle.destroy()
-    print('Path complete')
\ No newline at end of file
+# Remove the vehicle from the Carla world so interrupted runs do not leave
+#   orphaned actors behind in the simulator
+vehicle.destroy()
\ No newline at end of file